@@ -1,25 +1,248 @@
+import hashlib
+import math
+from dataclasses import dataclass
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy import signal
+from scipy.signal import czt
 import matplotlib.gridspec as gridspec
 from matplotlib.patches import Circle
 import matplotlib.cm as cm
+from numba import njit, prange
+
+
+@njit(cache=True, fastmath=True)
+def _wrap(phi):
+    """Wrap a phase in radians to [-pi, pi]"""
+    return phi - 2 * np.pi * np.rint(phi / (2 * np.pi))
+
+
+@njit(cache=True, fastmath=True)
+def _pll_kernel(signal_data, f1_init, f2_init, A1, A2, g1, g2, fs,
+                track_amplitude, amplitude_regularization, min_separation,
+                freq_regularization, n_tail, store_history,
+                out_freq1, out_freq2, out_A1, out_A2, out_phase1, out_phase2,
+                out_sep, out_err, out_reg, out_pe1, out_pe2):
+    """
+    Dual PLL loop over the samples, writing into the out_* histories.
+    
+    Per-state outputs have n_samples + 1 entries and entry 0 is left to
+    the caller; out_err, out_reg, out_pe1, out_pe2 have one entry per sample.
+    With store_history=False every output has a single entry, overwritten
+    each sample, so it ends up holding the final value.
+    
+    Returns the sums of freq1 and freq2 over the last n_tail states
+    (n_samples + 1 of them, counting the initial one).
+    """
+    n_samples = signal_data.shape[0]
+    tail_start = n_samples - n_tail
+    freq1_sum, freq2_sum = 0.0, 0.0
+    if n_tail > n_samples:
+        freq1_sum, freq2_sum = f1_init, f2_init
+    
+    phase1, phase2 = 0.0, 0.0
+    freq1, freq2 = f1_init, f2_init
+    
+    # Loop invariants: phase advance per Hz of NCO frequency, the
+    # regularization force per Hz inside min_separation, the amplitude step
+    omega_scale = 2 * math.pi / fs
+    reg_scale = freq_regularization / min_separation
+    learning_rate = 0.01
+    
+    # Loop filter integrals
+    phase_error1_integral = 0.0
+    phase_error2_integral = 0.0
+    
+    for i in range(n_samples):
+        y_re = signal_data[i].real
+        y_im = signal_data[i].imag
+        
+        # Output slots for this sample
+        k = i if store_history else 0
+        h = i + 1 if store_history else 0
+        
+        # Generate NCOs
+        c1, s1 = math.cos(phase1), math.sin(phase1)
+        c2, s2 = math.cos(phase2), math.sin(phase2)
+        
+        # Error against the current signal estimate A1 nco1 + A2 nco2 (the
+        # amplitudes are held fixed when not tracked, so it is the same
+        # either way), in real arithmetic
+        err_re = y_re - (A1 * c1 + A2 * c2)
+        err_im = y_im - (A1 * s1 + A2 * s2)
+        out_err[k] = math.sqrt(err_re * err_re + err_im * err_im)
+        
+        # Phase errors: Re(conj(error) * 1j * A * nco), where 1j * nco is
+        # just (-sin, cos)
+        phase_error1 = A1 * (err_im * c1 - err_re * s1)
+        phase_error2 = A2 * (err_im * c2 - err_re * s2)
+        
+        out_pe1[k] = phase_error1
+        out_pe2[k] = phase_error2
+        
+        # Regularization force, pushing the frequencies apart; sign is +1
+        # when freq2 > freq1 and -1 otherwise, so a tie pushes freq1 up as
+        # the original else branch did. An explicit compare (a select, not
+        # a branch) rather than copysign: fastmath may drop the sign of a
+        # zero difference.
+        separation = abs(freq2 - freq1)
+        gap = min_separation - separation
+        reg_force = reg_scale * max(gap, 0.0)
+        sign = 1.0 if freq2 > freq1 else -1.0
+        phase_error2 += reg_force * sign
+        phase_error1 -= reg_force * sign
+        
+        out_reg[k] = reg_force
+        
+        # Update frequencies
+        phase_error1_integral += phase_error1
+        phase_error2_integral += phase_error2
+        
+        freq1 = f1_init + g1 * phase_error1 + g2 * phase_error1_integral
+        freq2 = f2_init + g1 * phase_error2 + g2 * phase_error2_integral
+        
+        # Update phases
+        phase1 = _wrap(phase1 + omega_scale * freq1)
+        phase2 = _wrap(phase2 + omega_scale * freq2)
+        
+        # Update amplitudes if tracking
+        if track_amplitude:
+            # Gradient descent on amplitudes with regularization
+            # -2 Re(conj(error) * nco)
+            dA1 = -2 * (err_re * c1 + err_im * s1)
+            dA2 = -2 * (err_re * c2 + err_im * s2)
+            
+            # Add regularization gradient
+            dA1 += amplitude_regularization * (A1 - 1.0)
+            dA2 += amplitude_regularization * (A2 - 1.0)
+            
+            A1 -= learning_rate * dA1
+            A2 -= learning_rate * dA2
+            
+            # Constrain to positive
+            A1 = max(0.1, A1)
+            A2 = max(0.1, A2)
+        
+        # Running sums for the converged estimates
+        if i >= tail_start:
+            freq1_sum += freq1
+            freq2_sum += freq2
+        
+        # Store history
+        out_freq1[h] = freq1
+        out_freq2[h] = freq2
+        out_A1[h] = A1
+        out_A2[h] = A2
+        out_phase1[h] = phase1
+        out_phase2[h] = phase2
+        out_sep[h] = abs(freq2 - freq1)
+    
+    return freq1_sum, freq2_sum
+
+
+@njit(cache=True, fastmath=True, parallel=True)
+def _pll_kernel_batch(signal_data, f1_inits, f2_inits, A1, A2, g1, g2, fs,
+                      track_amplitude, amplitude_regularization, min_separation,
+                      freq_regularization, n_tail, store_history, out_sums,
+                      out_freq1, out_freq2, out_A1, out_A2, out_phase1, out_phase2,
+                      out_sep, out_err, out_reg, out_pe1, out_pe2):
+    """
+    Run independent PLLs from each (f1_inits[b], f2_inits[b]), one thread
+    per case.
+    
+    Outputs are stored structure-of-arrays with a leading case axis, so
+    each worker writes its own contiguous rows; the cases share only the
+    read-only signal.
+    """
+    for b in prange(f1_inits.shape[0]):
+        out_sums[b, 0], out_sums[b, 1] = _pll_kernel(
+            signal_data, f1_inits[b], f2_inits[b], A1, A2, g1, g2, fs,
+            track_amplitude, amplitude_regularization, min_separation,
+            freq_regularization, n_tail, store_history,
+            out_freq1[b], out_freq2[b], out_A1[b], out_A2[b],
+            out_phase1[b], out_phase2[b], out_sep[b],
+            out_err[b], out_reg[b], out_pe1[b], out_pe2[b]
+        )
+
+
+@dataclass
+class Results:
+    """
+    Dual PLL results from several initializations, structure-of-arrays.
+    
+    f1_init ... beat hold one entry per case and each history channel is
+    one array with a leading case axis. Indexing or iterating gives the
+    per-case result dicts, as returned by dual_pll_with_tracking plus
+    'label', 'f1_init' and 'f2_init'.
+    """
+    labels: list
+    f1_init: np.ndarray
+    f2_init: np.ndarray
+    f1: np.ndarray
+    f2: np.ndarray
+    beat: np.ndarray
+    history: dict
+    
+    def __len__(self):
+        return len(self.labels)
+    
+    def __getitem__(self, b):
+        return {
+            'f1': self.f1[b],
+            'f2': self.f2[b],
+            'beat': self.beat[b],
+            'history': {key: arr[b] for key, arr in self.history.items()},
+            'label': self.labels[b],
+            'f1_init': self.f1_init[b],
+            'f2_init': self.f2_init[b]
+        }
+    
+    def __iter__(self):
+        return (self[b] for b in range(len(self)))
+
 
 class DualPLLAnalyzer:
     def __init__(self, fs_baseband=960.0):
         self.fs = fs_baseband
+        self._landscape_cache = {}
         
     def dual_pll_with_tracking(self, signal_data, f1_init, f2_init, 
                               track_amplitude=False, amplitude_regularization=0.1,
-                              min_separation=0.003, freq_regularization=0.1):
+                              min_separation=0.003, freq_regularization=0.1,
+                              store_history=True):
         """
         Dual PLL with detailed tracking of all parameters
+        
+        store_history=False skips the per-sample histories: the converged
+        estimates come from running sums in the kernel and each 'history'
+        channel holds just its final value.
         """
-        n_samples = len(signal_data)
+        history, converged = self._run_pll_batch(
+            signal_data, [f1_init], [f2_init], track_amplitude,
+            amplitude_regularization, min_separation, freq_regularization,
+            store_history
+        )
+        converged_f1, converged_f2 = converged[0]
         
-        # Initialize
-        phase1, phase2 = 0.0, 0.0
-        freq1, freq2 = f1_init, f2_init
+        return {
+            'f1': converged_f1,
+            'f2': converged_f2,
+            'beat': converged_f2 - converged_f1,
+            'history': {key: arr[0] for key, arr in history.items()}
+        }
+    
+    def _run_pll_batch(self, signal_data, f1_inits, f2_inits, track_amplitude,
+                       amplitude_regularization, min_separation, freq_regularization,
+                       store_history=True):
+        """
+        Run one PLL per (f1_inits[b], f2_inits[b]) through the batched
+        kernel; returns the history channels with a leading case axis and
+        the converged (f1, f2) of each case.
+        """
+        n_samples = len(signal_data)
+        f1_inits = np.asarray(f1_inits, dtype=np.float64)
+        f2_inits = np.asarray(f2_inits, dtype=np.float64)
+        n_cases = len(f1_inits)
         
         # Amplitude tracking
         if track_amplitude:
@@ -35,126 +258,55 @@ class DualPLLAnalyzer:
         g1 = 4 * damping * theta / d
         g2 = 4 * theta**2 / d
         
-        # Storage for analysis
-        history = {
-            'freq1': [freq1],
-            'freq2': [freq2],
-            'A1': [A1],
-            'A2': [A2],
-            'phase1': [phase1],
-            'phase2': [phase2],
-            'separation': [abs(freq2 - freq1)],
-            'error': [],
-            'reg_force': [],
-            'phase_error1': [],
-            'phase_error2': []
-        }
-        
-        # Loop filter integrals
-        phase_error1_integral = 0
-        phase_error2_integral = 0
-        
-        for i, sample in enumerate(signal_data):
-            # Generate NCOs
-            nco1 = np.exp(1j * phase1)
-            nco2 = np.exp(1j * phase2)
-            
-            # Current signal estimate
-            if track_amplitude:
-                signal_est = A1 * nco1 + A2 * nco2
-            else:
-                # Simple correlation for fixed amplitudes
-                a1 = sample * np.conj(nco1)
-                a2 = sample * np.conj(nco2)
-                signal_est = a1 * nco1 + a2 * nco2
-            
-            # Error
-            error = sample - signal_est
-            history['error'].append(np.abs(error))
-            
-            # Phase errors
-            if track_amplitude:
-                phase_error1 = np.real(np.conj(error) * 1j * A1 * nco1)
-                phase_error2 = np.real(np.conj(error) * 1j * A2 * nco2)
-            else:
-                phase_error1 = np.real(np.conj(error) * 1j * a1 * nco1)
-                phase_error2 = np.real(np.conj(error) * 1j * a2 * nco2)
-            
-            history['phase_error1'].append(phase_error1)
-            history['phase_error2'].append(phase_error2)
-            
-            # Regularization force
-            separation = abs(freq2 - freq1)
-            reg_force = 0
-            if separation < min_separation:
-                reg_force = freq_regularization * (min_separation - separation) / min_separation
-                if freq2 > freq1:
-                    phase_error2 += reg_force
-                    phase_error1 -= reg_force
-                else:
-                    phase_error2 -= reg_force
-                    phase_error1 += reg_force
-            
-            history['reg_force'].append(reg_force)
-            
-            # Update frequencies
-            phase_error1_integral += phase_error1
-            phase_error2_integral += phase_error2
-            
-            freq1 = f1_init + g1 * phase_error1 + g2 * phase_error1_integral
-            freq2 = f2_init + g1 * phase_error2 + g2 * phase_error2_integral
-            
-            # Update phases
-            phase1 += 2 * np.pi * freq1 / self.fs
-            phase2 += 2 * np.pi * freq2 / self.fs
-            phase1 = np.angle(np.exp(1j * phase1))
-            phase2 = np.angle(np.exp(1j * phase2))
-            
-            # Update amplitudes if tracking
-            if track_amplitude:
-                # Gradient descent on amplitudes with regularization
-                learning_rate = 0.01
-                
-                dA1 = -2 * np.real(np.conj(error) * nco1)
-                dA2 = -2 * np.real(np.conj(error) * nco2)
-                
-                # Add regularization gradient
-                dA1 += amplitude_regularization * (A1 - 1.0)
-                dA2 += amplitude_regularization * (A2 - 1.0)
-                
-                A1 -= learning_rate * dA1
-                A2 -= learning_rate * dA2
-                
-                # Constrain to positive
-                A1 = max(0.1, A1)
-                A2 = max(0.1, A2)
-            
-            # Store history
-            history['freq1'].append(freq1)
-            history['freq2'].append(freq2)
-            history['A1'].append(A1)
-            history['A2'].append(A2)
-            history['phase1'].append(phase1)
-            history['phase2'].append(phase2)
-            history['separation'].append(abs(freq2 - freq1))
-        
-        # Convert to arrays
-        for key in history:
-            history[key] = np.array(history[key])
-        
-        # Final estimates
-        converged_f1 = np.mean(history['freq1'][-n_samples//4:])
-        converged_f2 = np.mean(history['freq2'][-n_samples//4:])
+        # Storage for analysis, one row per case: per-state arrays hold the
+        # initial value plus one entry per sample, per-sample arrays one
+        # entry per sample (a single final entry without store_history).
+        # The kernel state stays float64; the histories only feed plots
+        # and are stored as float32 (~0.5 uHz resolution at 5.6 Hz)
+        n_state = n_samples + 1 if store_history else 1
+        n_step = n_samples if store_history else 1
+        batch = {}
+        for key in ['freq1', 'freq2', 'A1', 'A2', 'phase1', 'phase2', 'separation']:
+            batch[key] = np.empty((n_cases, n_state), dtype=np.float32)
+        for key in ['error', 'reg_force', 'phase_error1', 'phase_error2']:
+            batch[key] = np.empty((n_cases, n_step), dtype=np.float32)
+        batch['freq1'][:, 0] = f1_inits
+        batch['freq2'][:, 0] = f2_inits
+        batch['A1'][:, 0] = A1
+        batch['A2'][:, 0] = A2
+        batch['phase1'][:, 0] = 0.0
+        batch['phase2'][:, 0] = 0.0
+        batch['separation'][:, 0] = np.abs(f2_inits - f1_inits)
+        
+        # Converged estimates average the same window as the original
+        # history[-n_samples//4:]: the last ceil(n_samples / 4) of the
+        # n_samples + 1 states, or just the initial state for an empty signal
+        n_tail = max(-(-n_samples // 4), 1)
+        sums = np.empty((n_cases, 2))
+        
+        _pll_kernel_batch(
+            np.ascontiguousarray(signal_data, dtype=np.complex128),
+            f1_inits, f2_inits, A1, A2, g1, g2, float(self.fs),
+            track_amplitude, amplitude_regularization, min_separation,
+            freq_regularization, n_tail, store_history, sums,
+            batch['freq1'], batch['freq2'], batch['A1'], batch['A2'],
+            batch['phase1'], batch['phase2'], batch['separation'],
+            batch['error'], batch['reg_force'],
+            batch['phase_error1'], batch['phase_error2']
+        )
         
-        return {
-            'f1': converged_f1,
-            'f2': converged_f2,
-            'beat': converged_f2 - converged_f1,
-            'history': history
-        }
+        return batch, sums / n_tail
     
-    def run_from_multiple_initializations(self, signal_data, f1_true, f2_true):
-        """Test dual PLL from various starting points"""
+    def run_from_multiple_initializations(self, signal_data, f1_true, f2_true,
+                                          store_history=True):
+        """
+        Test dual PLL from various starting points
+        
+        All cases run through one batched kernel, spread across cores, and
+        come back as a Results (one array entry or row per case).
+        store_history=False keeps only the final value of each history
+        channel, as for dual_pll_with_tracking.
+        """
         
         # Define test cases
         test_cases = [
@@ -169,37 +321,76 @@ class DualPLLAnalyzer:
             (5.5, 5.7, "Random far"),
         ]
         
-        results = []
-        for f1_init, f2_init, label in test_cases:
-            result = self.dual_pll_with_tracking(signal_data, f1_init, f2_init)
-            result['label'] = label
-            result['f1_init'] = f1_init
-            result['f2_init'] = f2_init
-            results.append(result)
-        
-        return results
+        f1_inits = np.array([f1 for f1, _, _ in test_cases])
+        f2_inits = np.array([f2 for _, f2, _ in test_cases])
+        history, converged = self._run_pll_batch(
+            signal_data, f1_inits, f2_inits,
+            track_amplitude=False, amplitude_regularization=0.1,
+            min_separation=0.003, freq_regularization=0.1,
+            store_history=store_history
+        )
+        converged_f1, converged_f2 = converged.T
+        
+        return Results(
+            labels=[label for _, _, label in test_cases],
+            f1_init=f1_inits,
+            f2_init=f2_inits,
+            f1=converged_f1,
+            f2=converged_f2,
+            beat=converged_f2 - converged_f1,
+            history=history
+        )
+    
+    def _grid_correlation(self, signal_data, f_grid):
+        """sum(y * exp(-2j pi f t)) for each f of a uniform grid, via CZT"""
+        df = f_grid[1] - f_grid[0]
+        return czt(signal_data, m=len(f_grid),
+                   w=np.exp(-2j * np.pi * df / self.fs),
+                   a=np.exp(2j * np.pi * f_grid[0] / self.fs))
     
     def compute_error_landscape(self, signal_data, f1_range, f2_range, true_f1, true_f2):
-        """Compute the error landscape for visualization"""
+        """
+        Compute the error landscape for visualization
+        
+        Results are cached per (signal contents, f1_range, f2_range), so
+        repeated visualizations of the same signal reuse the grid.
+        """
         n_points = 50
+        key = (hashlib.blake2b(np.ascontiguousarray(signal_data).tobytes(),
+                               digest_size=16).digest(),
+               tuple(f1_range), tuple(f2_range), n_points)
+        if key in self._landscape_cache:
+            return self._landscape_cache[key]
+        
         f1_grid = np.linspace(f1_range[0], f1_range[1], n_points)
         f2_grid = np.linspace(f2_range[0], f2_range[1], n_points)
         
-        error_landscape = np.zeros((n_points, n_points))
-        
-        # Pre-compute true signal for efficiency
-        t = np.arange(len(signal_data)) / self.fs
-        
-        for i, f1 in enumerate(f1_grid):
-            for j, f2 in enumerate(f2_grid):
-                # Compute error for this (f1, f2) pair
-                s1 = np.exp(1j * 2 * np.pi * f1 * t)
-                s2 = 0.7 * np.exp(1j * 2 * np.pi * f2 * t)
-                estimate = s1 + s2
-                
-                error = np.mean(np.abs(signal_data - estimate)**2)
-                error_landscape[j, i] = error  # Note: j, i for proper orientation
+        n_samples = len(signal_data)
         
+        # mean |y - s1 - 0.7 s2|^2 expanded as
+        #   (|y|^2 + 1.49 N - 2 Re<y, s1> - 1.4 Re<y, s2> + 1.4 Re<s2, s1>) / N
+        # with <a, b> = sum(a * conj(b)). The grids are uniform, so
+        # <y, s> over a grid is a chirp-z transform of y, and <s2, s1>
+        # depends only on f2 - f1 (a Dirichlet kernel); no N x n_points
+        # matrix is built.
+        c1 = self._grid_correlation(signal_data, f1_grid)
+        c2 = self._grid_correlation(signal_data, f2_grid)
+        
+        # sum_n exp(1j theta n) = exp(1j theta (N-1)/2) sin(N theta/2) / sin(theta/2)
+        theta = 2 * np.pi * (f2_grid[:, None] - f1_grid[None, :]) / self.fs
+        half_sin = np.sin(theta / 2)
+        dirichlet = np.divide(np.sin(n_samples * theta / 2), half_sin,
+                              out=np.full_like(theta, float(n_samples)),
+                              where=half_sin != 0)
+        cross = np.cos((n_samples - 1) * theta / 2) * dirichlet  # Re<s2, s1>[j, i]
+        
+        energy = np.vdot(signal_data, signal_data).real + 1.49 * n_samples
+        error_landscape = (energy
+                           - 2 * c1.real[None, :]
+                           - 1.4 * c2.real[:, None]
+                           + 1.4 * cross) / n_samples  # Note: j, i for proper orientation
+        
+        self._landscape_cache[key] = (f1_grid, f2_grid, error_landscape)
         return f1_grid, f2_grid, error_landscape
     
     def visualize_dual_pll_analysis(self, results, signal_data, f1_true, f2_true):
@@ -288,10 +479,10 @@ class DualPLLAnalyzer:
         ax4 = fig.add_subplot(gs[2, :2])
         
         # Bar chart of final errors
-        labels = [r['label'] for r in results]
-        f1_errors = [(r['f1'] - f1_true) * 1000 for r in results]
-        f2_errors = [(r['f2'] - f2_true) * 1000 for r in results]
-        beat_errors = [(r['beat'] - (f2_true - f1_true)) * 1000 for r in results]
+        labels = results.labels
+        f1_errors = (results.f1 - f1_true) * 1000
+        f2_errors = (results.f2 - f2_true) * 1000
+        beat_errors = (results.beat - (f2_true - f1_true)) * 1000
         
         x = np.arange(len(labels))
         width = 0.25
@@ -316,8 +507,9 @@ class DualPLLAnalyzer:
         truth_result = results[0]
         history = truth_result['history']
         
-        # Reconstruct signals at a few time points
-        t = np.arange(len(signal_data)) / self.fs
+        # Reconstruct signals at a few time points; only the first 100
+        # samples are plotted, so only those are built
+        t = np.arange(min(100, len(signal_data))) / self.fs
         time_points = [0, len(signal_data)//4, len(signal_data)//2, -1]
         
         for i, tp in enumerate(time_points):
@@ -327,19 +519,19 @@ class DualPLLAnalyzer:
             else:
                 label = f'Sample {tp}'
                 
-            # Reconstruct
-            s1 = history['A1'][tp] * np.exp(1j * 2 * np.pi * history['freq1'][tp] * t)
-            s2 = history['A2'][tp] * np.exp(1j * 2 * np.pi * history['freq2'][tp] * t)
+            # Reconstruct (real part only)
+            s1 = history['A1'][tp] * np.cos(2 * np.pi * history['freq1'][tp] * t)
+            s2 = history['A2'][tp] * np.cos(2 * np.pi * history['freq2'][tp] * t)
             reconstruction = s1 + s2
             
             if tp == -1:
-                ax5.plot(t[:100], np.real(reconstruction[:100]), 'k-', 
+                ax5.plot(t, reconstruction, 'k-', 
                         linewidth=2, alpha=alpha, label=label)
             else:
-                ax5.plot(t[:100], np.real(reconstruction[:100]), '-', 
+                ax5.plot(t, reconstruction, '-', 
                         linewidth=1, alpha=alpha, label=label)
         
-        ax5.plot(t[:100], np.real(signal_data[:100]), 'r--', 
+        ax5.plot(t, np.real(signal_data[:100]), 'r--', 
                 linewidth=2, alpha=0.8, label='True signal')
         ax5.set_xlabel('Time (s)')
         ax5.set_ylabel('Real part')
@@ -350,14 +542,18 @@ class DualPLLAnalyzer:
         # 6. Phase Error Evolution
         ax6 = fig.add_subplot(gs[3, :2])
         
-        for i, result in enumerate(results[:4]):  # Show first 4 to avoid clutter
-            history = result['history']
-            samples = np.arange(len(history['phase_error1']))
-            
-            ax6.plot(samples[::10], history['phase_error1'][::10], '-', 
-                    color=colors[i], alpha=0.6, label=f"{result['label']} PLL1")
-            ax6.plot(samples[::10], history['phase_error2'][::10], '--', 
-                    color=colors[i], alpha=0.6, label=f"{result['label']} PLL2")
+        # Decimate once into contiguous arrays, all plotted cases together
+        stride = 10
+        n_shown = min(4, len(results))  # Show first 4 to avoid clutter
+        samples = np.arange(0, results.history['phase_error1'].shape[1], stride)
+        pe1_dec = np.ascontiguousarray(results.history['phase_error1'][:n_shown, ::stride])
+        pe2_dec = np.ascontiguousarray(results.history['phase_error2'][:n_shown, ::stride])
+        
+        for i in range(n_shown):
+            ax6.plot(samples, pe1_dec[i], '-', 
+                    color=colors[i], alpha=0.6, label=f"{results.labels[i]} PLL1")
+            ax6.plot(samples, pe2_dec[i], '--', 
+                    color=colors[i], alpha=0.6, label=f"{results.labels[i]} PLL2")
         
         ax6.set_xlabel('Sample')
         ax6.set_ylabel('Phase Error')
@@ -375,18 +571,18 @@ class DualPLLAnalyzer:
         summary_text += f"True beat: {(f2_true-f1_true)*1000:.3f} mHz\n\n"
         
         # Find best and worst cases
-        beat_errors_abs = [abs(e) for e in beat_errors]
+        beat_errors_abs = np.abs(beat_errors)
         best_idx = np.argmin(beat_errors_abs)
         worst_idx = np.argmax(beat_errors_abs)
         
-        summary_text += f"Best case: {results[best_idx]['label']}\n"
+        summary_text += f"Best case: {labels[best_idx]}\n"
         summary_text += f"  Beat error: {beat_errors[best_idx]:+.3f} mHz\n\n"
         
-        summary_text += f"Worst case: {results[worst_idx]['label']}\n"
+        summary_text += f"Worst case: {labels[worst_idx]}\n"
         summary_text += f"  Beat error: {beat_errors[worst_idx]:+.3f} mHz\n\n"
         
         # Check for exact 6.000 mHz results
-        exact_6_count = sum(1 for r in results if abs(r['beat']*1000 - 6.0) < 0.001)
+        exact_6_count = np.count_nonzero(np.abs(results.beat*1000 - 6.0) < 0.001)
         summary_text += f"Cases with exactly 6.000 mHz: {exact_6_count}/{len(results)}\n"
         
         if exact_6_count > 0:
@@ -406,8 +602,41 @@ class DualPLLAnalyzer:
         
         return fig
 
+# Check the compiled PLL kernel against its Python source on a tie
+def test_pll_kernel_tie():
+    """
+    With f1_init == f2_init the separation force decides which tone moves
+    up; the compiled (fastmath) kernel must push the same way as
+    _pll_kernel.py_func, i.e. freq1 up as in the original else branch.
+    """
+    fs_baseband = 960.0
+    n_samples = 288
+    t = np.arange(n_samples) / fs_baseband
+    signal_data = (np.exp(1j * 2 * np.pi * 5.625480 * t) + 
+                   0.7 * np.exp(1j * 2 * np.pi * 5.631480 * t))
+    f_init = 5.625480
+    
+    theta = 2 * np.pi * 0.5 / fs_baseband
+    d = 1 + 2 * theta + theta**2
+    g1 = 4 * theta / d
+    g2 = 4 * theta**2 / d
+    
+    histories = []
+    for kernel in (_pll_kernel, _pll_kernel.py_func):
+        out = [np.empty(n_samples + 1) for _ in range(7)]
+        out += [np.empty(n_samples) for _ in range(4)]
+        kernel(signal_data, f_init, f_init, 1.0, 0.7, g1, g2, fs_baseband,
+               False, 0.1, 0.003, 0.1, n_samples // 4, True, *out)
+        histories.append((out[0][1:], out[1][1:]))
+    
+    (freq1, freq2), (freq1_py, freq2_py) = histories
+    assert freq1[0] > freq2[0], "tie pushed freq1 down"
+    assert np.allclose(freq1, freq1_py, rtol=0, atol=1e-9)
+    assert np.allclose(freq2, freq2_py, rtol=0, atol=1e-9)
+    print("Compiled PLL kernel matches py_func on a tie")
+
 # Test the dual PLL analyzer
-def test_dual_pll_analyzer():
+def test_dual_pll_analyzer(visualize=True):
     # Generate test signal
     fs_baseband = 960.0
     duration = 0.3
@@ -431,7 +660,8 @@ def test_dual_pll_analyzer():
     
     # Run from multiple initializations
     print("Running dual PLL from multiple initializations...")
-    results = analyzer.run_from_multiple_initializations(signal_data, f1_true, f2_true)
+    results = analyzer.run_from_multiple_initializations(signal_data, f1_true, f2_true,
+                                                         store_history=visualize)
     
     # Print results
     print("\n" + "="*60)
@@ -446,8 +676,9 @@ def test_dual_pll_analyzer():
         print(f"  Final: f1={result['f1']:.6f}, f2={result['f2']:.6f}")
         print(f"  Beat: {result['beat']*1000:.3f} mHz (error: {(result['beat']-(f2_true-f1_true))*1000:+.3f} mHz)")
     
-    # Visualize
-    fig = analyzer.visualize_dual_pll_analysis(results, signal_data, f1_true, f2_true)
+    # Visualize (skipped with visualize=False, e.g. when timing the tracker)
+    if visualize:
+        fig = analyzer.visualize_dual_pll_analysis(results, signal_data, f1_true, f2_true)
     
     # Test with amplitude tracking
     print("\n" + "="*60)
@@ -464,4 +695,6 @@ def test_dual_pll_analyzer():
     return analyzer, results
 
 # Run the test
-analyzer, results = test_dual_pll_analyzer()
\ No newline at end of file
+if __name__ == "__main__":
+    test_pll_kernel_tie()
+    analyzer, results = test_dual_pll_analyzer()
\ No newline at end of file